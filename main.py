@@ -88,7 +88,7 @@ solar_api = SolarAPI()
 
 class TelegramWebhookHandler:
     def __init__(self):
-        self.solar_api = SolarAPI()
+        self.solar_api = solar_api  # share the module-level client
     
     def _clean_text(self, text: str) -> str:
         """Clean text using shared Telegram formatter"""
@@ -357,8 +357,8 @@ class TelegramWebhookHandler:
             # If search was used, show sources
             if search_was_used and final_sources:
                 try:
-                    citation_result_json = await asyncio.to_thread(
-                        self.solar_api.add_citations,
+                    # add_citations is a cheap regex scan, so call it inline rather than in a worker thread
+                    citation_result_json = self.solar_api.add_citations(
                         response_text=final_answer,
                         sources=final_sources
                     )
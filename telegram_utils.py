@@ -5,6 +5,21 @@ from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
+# Precompiled patterns used by TelegramFormatter
+_BOLD_RE = re.compile(r'\*\*(.*?)\*\*|__(.*?)__')
+_ITALIC_RE = re.compile(r'\*(.*?)\*|_(.*?)_(?![*_])')
+_CODE_BLOCK_RE = re.compile(r'```(.*?)```', re.DOTALL)
+_INLINE_CODE_RE = re.compile(r'`(.*?)`')
+_LINK_RE = re.compile(r'\[(.*?)\]\((.*?)\)')
+_NUMBERED_TITLE_RE = re.compile(r'(\d+)\.\s+\*\*(.*?)\*\*\s+(.*?)(?=\n\d+\.|\n\n|$)', re.DOTALL)
+_BULLET_RE = re.compile(r'^\s*[-*+]\s+(.*?)$', re.MULTILINE)
+_EXCESS_NEWLINES_RE = re.compile(r'\n{3,}')
+_RESTAURANT_ITEM_RE = re.compile(r'(\d+)\.\s+\*\*(.*?)\*\*\s*(\(.*?\))?\s*(?:-|\n-)\s*(.*?)(?=\n\d+\.|\Z)', re.DOTALL)
+_CITATION_REF_RE = re.compile(r'\[\d+\]')
+_WHITESPACE_RE = re.compile(r'\s+')
+_DASH_BULLET_RE = re.compile(r'^\s*-\s+', re.MULTILINE)
+_THINK_RE = re.compile(r'<think>(.*?)</think>', re.DOTALL)
+
 class TelegramConfig:
     """Configuration constants for Telegram bot behavior"""
     
@@ -38,19 +53,19 @@ class TelegramFormatter:
     def format_markdown_for_telegram(text: str) -> str:
         """Convert common Markdown syntax to Telegram-compatible HTML format."""
         # Handle bold text: **text** or __text__ -> <b>text</b>
-        text = re.sub(r'\*\*(.*?)\*\*|__(.*?)__', lambda m: f'<b>{m.group(1) or m.group(2)}</b>', text)
+        text = _BOLD_RE.sub(lambda m: f'<b>{m.group(1) or m.group(2)}</b>', text)
         
         # Handle italic text: *text* or _text_ -> <i>text</i>
-        text = re.sub(r'\*(.*?)\*|_(.*?)_(?![*_])', lambda m: f'<i>{m.group(1) or m.group(2)}</i>', text)
+        text = _ITALIC_RE.sub(lambda m: f'<i>{m.group(1) or m.group(2)}</i>', text)
         
         # Handle code blocks: ```text``` -> <pre>text</pre>
-        text = re.sub(r'```(.*?)```', lambda m: f'<pre>{m.group(1)}</pre>', text, flags=re.DOTALL)
+        text = _CODE_BLOCK_RE.sub(lambda m: f'<pre>{m.group(1)}</pre>', text)
         
         # Handle inline code: `text` -> <code>text</code>
-        text = re.sub(r'`(.*?)`', lambda m: f'<code>{m.group(1)}</code>', text)
+        text = _INLINE_CODE_RE.sub(lambda m: f'<code>{m.group(1)}</code>', text)
         
         # Handle links: [text](url) -> <a href="url">text</a>
-        text = re.sub(r'\[(.*?)\]\((.*?)\)', lambda m: f'<a href="{m.group(2)}">{m.group(1)}</a>', text)
+        text = _LINK_RE.sub(lambda m: f'<a href="{m.group(2)}">{m.group(1)}</a>', text)
         
         # Process numbered lists with preservation of structure
         def process_numbered_list(match):
@@ -59,15 +74,13 @@ class TelegramFormatter:
             return f"{number}. <b>{content}</b>\n"
             
         # Handle numbered lists with item title formatting (assumes format: "1. **Title** - content")
-        text = re.sub(r'(\d+)\.\s+\*\*(.*?)\*\*\s+(.*?)(?=\n\d+\.|\n\n|$)', 
-                      lambda m: f"{m.group(1)}. <b>{m.group(2)}</b>\n{m.group(3)}\n", 
-                      text, flags=re.DOTALL)
+        text = _NUMBERED_TITLE_RE.sub(lambda m: f"{m.group(1)}. <b>{m.group(2)}</b>\n{m.group(3)}\n", text)
         
         # Handle bullet points with proper formatting
-        text = re.sub(r'^\s*[-*+]\s+(.*?)$', r'• \1', text, flags=re.MULTILINE)
+        text = _BULLET_RE.sub(r'• \1', text)
         
         # Ensure proper paragraph breaks (double newlines)
-        text = re.sub(r'\n{3,}', '\n\n', text)
+        text = _EXCESS_NEWLINES_RE.sub('\n\n', text)
         
         return text
 
@@ -76,7 +89,6 @@ class TelegramFormatter:
         """Process restaurant or numbered list patterns with proper formatting."""
         # Pattern for numbered list items with titles and descriptions
         # Example: 1. **Restaurant Name** (Location) - Description
-        pattern = r'(\d+)\.\s+\*\*(.*?)\*\*\s*(\(.*?\))?\s*(?:-|\n-)\s*(.*?)(?=\n\d+\.|\Z)'
         
         def format_restaurant_item(match):
             number = match.group(1)
@@ -85,13 +97,13 @@ class TelegramFormatter:
             description = match.group(4).strip()
             
             # Extract citation references like [1][2] and preserve them
-            citation_refs = re.findall(r'\[\d+\]', description)
+            citation_refs = _CITATION_REF_RE.findall(description)
             if citation_refs:
                 citation_str = " ".join(citation_refs)
                 # Remove citations from main text to reposition them
-                description = re.sub(r'\[\d+\]', '', description)
+                description = _CITATION_REF_RE.sub('', description)
                 # Clean up spacing after citation removal
-                description = re.sub(r'\s+', ' ', description)
+                description = _WHITESPACE_RE.sub(' ', description)
                 description = description.strip()
                 # Add citation refs at the end of title line
                 location_with_citations = f"{location} {citation_str}".strip()
@@ -99,7 +111,7 @@ class TelegramFormatter:
                 location_with_citations = location
             
             # Format bullet points in description if they exist
-            description = re.sub(r'^\s*-\s+', '\n• ', description, flags=re.MULTILINE)
+            description = _DASH_BULLET_RE.sub('\n• ', description)
             # Ensure description starts with newline for proper formatting
             if not description.startswith('\n') and description:
                 description = '\n' + description
@@ -109,7 +121,7 @@ class TelegramFormatter:
             return formatted_item
             
         # Apply pattern with flags to handle multiline entries
-        text = re.sub(pattern, format_restaurant_item, text, flags=re.DOTALL)
+        text = _RESTAURANT_ITEM_RE.sub(format_restaurant_item, text)
         
         return text
 
@@ -143,7 +155,7 @@ class TelegramFormatter:
         text = TelegramFormatter.format_restaurant_list(text)
 
         # Handle think tags
-        text = re.sub(r'<think>(.*?)</think>', replace_think_section, text, flags=re.DOTALL)
+        text = _THINK_RE.sub(replace_think_section, text)
         
         # Then format remaining text with markdown
         text = TelegramFormatter.format_markdown_for_telegram(text)
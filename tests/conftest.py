@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="session", autouse=True)
+def isolated_cwd(tmp_path_factory):
+    """Run the suite from a temp directory so the default ./memory.json and its log stay out of the repo."""
+    original = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("cwd"))
+    yield
+    os.chdir(original)
+
+
+@pytest.fixture(scope="module")
+def handler():
+    """Shared TelegramWebhookHandler for tests that don't mutate handler state."""
+    from main import TelegramWebhookHandler
+    return TelegramWebhookHandler()
@@ -3,6 +3,8 @@ import json
 import os
 import sys
 import time
+from collections import namedtuple
+from types import SimpleNamespace
 from unittest.mock import Mock, patch
 
 # Add parent directory to path so we can import our modules
@@ -12,6 +14,68 @@ from solar import SolarAPI
 from citations import CitationManager, extract_search_queries
 
 
+# Shape of a single Tavily search result
+_RESULT_TEMPLATE = {
+    'title': 'Test Result',
+    'url': 'https://example.com/1',
+    'content': 'Test content',
+    'score': 0.9
+}
+
+
+def _result(drop=(), **overrides):
+    """Build a Tavily search result from the template, minus any ``drop`` keys."""
+    result = {**_RESULT_TEMPLATE, **overrides}
+    for key in drop:
+        del result[key]
+    return result
+
+
+# 20 search results, more than the 15 _get_search_grounded_response keeps
+_MANY_RESULTS = {
+    'results': [
+        {
+            'title': 'Test Result ' + n,
+            'url': 'https://example.com/' + n,
+            'content': 'Test content ' + n,
+            'score': 0.9 - (i * 0.01)
+        } for i, n in enumerate(map(str, range(20)))
+    ]
+}
+
+
+SOLAR_URL = "https://api.upstage.ai/v1/chat/completions"
+TAVILY_URL = "https://api.tavily.com/search"
+
+
+class _Sink:
+    """Callback stand-in that records whether it was called and with what."""
+    
+    __slots__ = ('called', 'payload')
+    
+    def __init__(self):
+        self.called = False
+        self.payload = None
+    
+    def __call__(self, payload=None):
+        self.called = True
+        self.payload = payload
+
+
+@pytest.fixture
+def http(requests_mock):
+    """Stub HTTP traffic at the requests transport layer, dispatched by URL."""
+    return requests_mock
+
+
+_SSEEvent = namedtuple('_SSEEvent', 'data')
+
+
+def _fake_sse(events):
+    """Build a stand-in for sseclient.SSEClient that lazily yields ``events``."""
+    return SimpleNamespace(events=lambda: iter(events))
+
+
 class TestSolarAPIIntegration:
     """Integration tests for SolarAPI with CitationManager."""
     
@@ -59,8 +123,6 @@ class TestSolarAPIIntegration:
     def test_backward_compatibility(self):
         """Test that existing code still works after the split."""
         # This should work exactly as before the split
-        from solar import SolarAPI
-        
         api = SolarAPI('test-key')
         
         # All these methods should be available and work
@@ -92,28 +154,6 @@ class TestSolarAPIIntegration:
         assert result_data["search_queries"] == ["test query"]
 
 
-class TestTelegramBotIntegration:
-    """Integration tests for Telegram bot functionality."""
-    
-    def test_telegram_bot_imports(self):
-        """Test that telegram bot can import required modules."""
-        try:
-            from telegram_bot import TelegramBot
-            assert TelegramBot is not None
-        except ImportError as e:
-            pytest.skip(f"Telegram bot dependencies not available: {e}")
-    
-    def test_solar_api_initialization_in_bot_context(self):
-        """Test SolarAPI works in the context of the telegram bot."""
-        # This simulates how the bot would initialize the API
-        api_key = 'test-key'
-        solar_api = SolarAPI(api_key)
-        
-        # Verify citation manager is available for bot usage
-        assert hasattr(solar_api, 'citation_manager')
-        assert callable(getattr(solar_api, 'intelligent_complete', None))
-
-
 class TestFileStructureIntegration:
     """Test that the file structure reorganization works correctly."""
     
@@ -185,16 +225,12 @@ class TestEndToEndWorkflow:
         result2 = solar.fill_citation_heuristic(response_text, sources)
         assert isinstance(json.loads(result2)["cited_text"], str)
     
-    @patch('requests.post')
-    def test_complete_with_search_grounding_mock(self, mock_post):
+    def test_complete_with_search_grounding_mock(self, http):
         """Test complete method with search grounding using mocked requests."""
         # Mock the API response
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+        http.post(SOLAR_URL, json={
             "choices": [{"message": {"content": "Mocked response from Solar API"}}]
-        }
-        mock_post.return_value = mock_response
+        })
         
         solar = SolarAPI('test-key')
         
@@ -203,12 +239,12 @@ class TestEndToEndWorkflow:
         assert result == "Mocked response from Solar API"
         
         # Verify the API was called
-        mock_post.assert_called_once()
+        assert http.call_count == 1
         
-        # Check the call arguments
-        call_args = mock_post.call_args
-        assert call_args[1]['headers']['Authorization'] == 'Bearer test-key'
-        assert 'Test prompt' in str(call_args[1]['json'])
+        # Check the request that was sent
+        request = http.last_request
+        assert request.headers['Authorization'] == 'Bearer test-key'
+        assert 'Test prompt' in str(request.json())
 
 
 if __name__ == "__main__":
@@ -327,11 +363,8 @@ class TestTelegramBotIntegration:
     
     def test_telegram_bot_imports(self):
         """Test that telegram bot can import required modules."""
-        try:
-            from telegram_bot import TelegramBot
-            assert TelegramBot is not None
-        except ImportError as e:
-            pytest.skip(f"Telegram bot dependencies not available: {e}")
+        telegram_bot = pytest.importorskip('telegram_bot', reason="Telegram bot dependencies not available")
+        assert telegram_bot.TelegramBot is not None
     
     def test_solar_api_initialization_in_bot_context(self):
         """Test SolarAPI works in the context of the telegram bot."""
@@ -486,6 +519,7 @@ class TestPerformanceAndConcurrency:
                     assert result['answer'] == 'Fast answer'
 
 
+@pytest.mark.xdist_group(name='solar_api_unit')
 class TestSolarAPIComprehensiveCoverage:
     """Comprehensive tests to achieve 100% coverage for solar.py."""
     
@@ -497,16 +531,8 @@ class TestSolarAPIComprehensiveCoverage:
     def test_intelligent_complete_search_path_coverage(self, solar_api):
         """Test the search path in intelligent_complete with all branches."""
         # Test search path with on_search_start callback
-        search_start_called = False
-        search_done_called = False
-        
-        def on_search_start():
-            nonlocal search_start_called
-            search_start_called = True
-        
-        def on_search_done(sources):
-            nonlocal search_done_called
-            search_done_called = True
+        on_search_start = _Sink()
+        on_search_done = _Sink()
         
         with patch.object(solar_api, '_check_search_needed', return_value='Y'):
             with patch.object(solar_api, '_extract_search_queries_fast', return_value='["test query"]'):
@@ -519,7 +545,7 @@ class TestSolarAPIComprehensiveCoverage:
                         on_search_done=on_search_done
                     )
                     
-                    assert search_start_called
+                    assert on_search_start.called
                     assert result['search_used'] == True
                     assert result['answer'] == 'Search result'
                     assert result['sources'] == []
@@ -604,90 +630,63 @@ class TestSolarAPIComprehensiveCoverage:
             result = solar_api._extract_search_queries_fast("error query", "model")
             assert result == ["error query"]
     
-    def test_get_search_grounded_response_no_tavily_key(self, solar_api):
+    def test_get_search_grounded_response_no_tavily_key(self, solar_api, monkeypatch):
         """Test _get_search_grounded_response without TAVILY_API_KEY."""
-        with patch.dict(os.environ, {}, clear=True):  # Clear environment
-            with patch.object(solar_api, '_get_direct_answer', return_value='Mock answer'):
-                search_done_called = False
-                
-                def on_search_done(sources):
-                    nonlocal search_done_called
-                    search_done_called = True
-                
-                result = solar_api._get_search_grounded_response(
-                    "test query", ["query1"], "model", False, None, on_search_done
-                )
-                
-                assert search_done_called
-                assert 'response' in result
-                assert 'sources' in result
-                assert 'Using mock data' in result['response']
-                assert len(result['sources']) == 1
-                assert result['sources'][0]['title'] == 'Mock Search Result'
+        monkeypatch.delenv('TAVILY_API_KEY', raising=False)
+        with patch.object(solar_api, '_get_direct_answer', return_value='Mock answer'):
+            on_search_done = _Sink()
+            
+            result = solar_api._get_search_grounded_response(
+                "test query", ["query1"], "model", False, None, on_search_done
+            )
+            
+            assert on_search_done.called
+            assert 'response' in result
+            assert 'sources' in result
+            assert 'Using mock data' in result['response']
+            assert len(result['sources']) == 1
+            assert result['sources'][0]['title'] == 'Mock Search Result'
     
     def test_get_search_grounded_response_with_tavily_key(self, solar_api):
         """Test _get_search_grounded_response with TAVILY_API_KEY."""
         mock_search_results = {
             'results': [
-                {
-                    'title': 'Test Result 1',
-                    'url': 'https://example.com/1',
-                    'content': 'Test content 1',
-                    'score': 0.9
-                },
-                {
-                    'title': 'Test Result 2',
-                    'url': 'https://example.com/2',
-                    'content': 'Test content 2',
-                    'score': 0.8
-                },
+                _result(title='Test Result 1', content='Test content 1'),
+                _result(title='Test Result 2', url='https://example.com/2', content='Test content 2', score=0.8),
                 # Duplicate URL to test deduplication
-                {
-                    'title': 'Duplicate Result',
-                    'url': 'https://example.com/1',
-                    'content': 'Duplicate content',
-                    'score': 0.7
-                }
+                _result(title='Duplicate Result', content='Duplicate content', score=0.7)
             ]
         }
         
         with patch.dict(os.environ, {'TAVILY_API_KEY': 'test-key'}):
             with patch.object(solar_api, '_tavily_search', return_value=mock_search_results):
                 with patch.object(solar_api, 'complete', return_value='Grounded response'):
-                    search_done_called = False
-                    sources_received = []
-                    
-                    def on_search_done(sources):
-                        nonlocal search_done_called, sources_received
-                        search_done_called = True
-                        sources_received = sources
+                    on_search_done = _Sink()
                     
                     result = solar_api._get_search_grounded_response(
                         "test query", ["query1", "query2"], "model", False, None, on_search_done
                     )
                     
-                    assert search_done_called
-                    assert len(sources_received) == 2  # Deduplicated (removed duplicate URL)
+                    assert on_search_done.called
+                    assert len(on_search_done.payload) == 2  # Deduplicated (removed duplicate URL)
                     assert 'response' in result
                     assert 'sources' in result
                     assert result['response'] == 'Grounded response'
     
-    def test_tavily_search_method(self, solar_api):
+    def test_tavily_search_method(self, solar_api, http):
         """Test _tavily_search method."""
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+        http.post(TAVILY_URL, json={
             'results': [
                 {'title': 'Test', 'url': 'https://example.com', 'content': 'Test content'}
             ]
-        }
+        })
         
-        with patch('requests.post', return_value=mock_response):
-            result = solar_api._tavily_search("test query", "test-api-key", max_results=5)
-            
-            assert 'results' in result
-            assert len(result['results']) == 1
-            assert result['results'][0]['title'] == 'Test'
+        result = solar_api._tavily_search("test query", "test-api-key", max_results=5)
+        
+        assert 'results' in result
+        assert len(result['results']) == 1
+        assert result['results'][0]['title'] == 'Test'
+        assert http.last_request.json()['max_results'] == 5
     
     def test_complete_method_search_grounding(self, solar_api):
         """Test complete method with search_grounding enabled."""
@@ -705,17 +704,17 @@ class TestSolarAPIComprehensiveCoverage:
                     # When return_sources=True, it returns a dict with response and sources
                     assert result == {'response': 'Grounded response', 'sources': []}
     
-    def test_complete_method_no_tavily_key_search_grounding(self, solar_api):
+    def test_complete_method_no_tavily_key_search_grounding(self, solar_api, monkeypatch):
         """Test complete method with search_grounding but no TAVILY_API_KEY."""
-        with patch.dict(os.environ, {}, clear=True):  # Clear environment
-            with patch.object(solar_api, '_standard_request', return_value='Direct response'):
-                
-                result = solar_api.complete(
-                    "test prompt",
-                    search_grounding=True
-                )
-                
-                assert result == 'Direct response'
+        monkeypatch.delenv('TAVILY_API_KEY', raising=False)
+        with patch.object(solar_api, '_standard_request', return_value='Direct response'):
+            
+            result = solar_api.complete(
+                "test prompt",
+                search_grounding=True
+            )
+            
+            assert result == 'Direct response'
     
     def test_complete_method_streaming(self, solar_api):
         """Test complete method with streaming."""
@@ -731,47 +730,38 @@ class TestSolarAPIComprehensiveCoverage:
             
             assert result == 'Streamed response'
     
-    def test_standard_request_method(self, solar_api):
+    def test_standard_request_method(self, solar_api, http):
         """Test _standard_request method."""
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+        http.post(SOLAR_URL, json={
             'choices': [{'message': {'content': 'API response'}}]
-        }
+        })
         
         payload = {'test': 'payload'}
         
-        with patch('requests.post', return_value=mock_response):
-            result = solar_api._standard_request(payload)
-            assert result == 'API response'
+        result = solar_api._standard_request(payload)
+        assert result == 'API response'
     
-    def test_stream_request_method(self, solar_api):
+    def test_stream_request_method(self, solar_api, http):
         """Test _stream_request method."""
-        # Mock SSE response
-        mock_events = [
-            Mock(data='data: {"choices": [{"delta": {"content": "Hello"}}]}'),
-            Mock(data='data: {"choices": [{"delta": {"content": " world"}}]}'),
-            Mock(data='data: [DONE]')
+        # SSE events as sseclient delivers them (data without the "data: " prefix)
+        events = [
+            _SSEEvent('{"choices": [{"delta": {"content": "Hello"}}]}'),
+            _SSEEvent('{"choices": [{"delta": {"content": " world"}}]}'),
+            _SSEEvent('[DONE]'),
+            _SSEEvent('{"choices": [{"delta": {"content": " ignored"}}]}')
         ]
         
         updates_received = []
         def mock_update(content):
             updates_received.append(content)
         
-        mock_response = Mock()
-        mock_response.status_code = 200
+        http.post(SOLAR_URL)
         
-        # Mock SSEClient as a class with events() method
-        mock_client = Mock()
-        mock_client.events.return_value = mock_events
-        
-        with patch('sseclient.SSEClient', return_value=mock_client):
-            with patch('requests.post', return_value=mock_response):
-                result = solar_api._stream_request({'test': 'payload'}, mock_update)
-                
-                # Due to mocking complexities, just verify the method runs without error
-                assert isinstance(result, str)
-                # The result might be empty due to mocking, but the method should not crash
+        with patch('sseclient.SSEClient', return_value=_fake_sse(events)):
+            result = solar_api._stream_request({'test': 'payload'}, mock_update)
+            
+            assert result == 'Hello world'
+            assert updates_received == ['Hello', ' world']
     
     def test_citation_delegation_methods(self, solar_api):
         """Test citation delegation methods."""
@@ -789,6 +779,7 @@ class TestSolarAPIComprehensiveCoverage:
             assert result == 'fill_result'
 
 
+@pytest.mark.xdist_group(name='telegram_bot')
 class TestTelegramBotComprehensiveCoverage:
     """Comprehensive tests for telegram bot integration coverage."""
     
@@ -797,15 +788,12 @@ class TestTelegramBotComprehensiveCoverage:
         """Create a SolarAPI instance for testing."""
         return SolarAPI('test-key')
     
-    def test_telegram_bot_error_scenarios(self):
+    def test_telegram_bot_error_scenarios(self, monkeypatch):
         """Test telegram bot import error scenarios."""
-        # Test when telegram_bot module doesn't exist or has issues
-        with patch('builtins.__import__', side_effect=ImportError("Module not found")):
-            try:
-                from telegram_bot import TelegramBot
-                pytest.fail("Should have raised ImportError")
-            except ImportError:
-                pass  # Expected
+        # A None entry in sys.modules makes the next import raise ImportError
+        monkeypatch.setitem(sys.modules, 'telegram_bot', None)
+        with pytest.raises(ImportError):
+            from telegram_bot import TelegramBot
     
     def test_solar_api_with_different_configurations(self):
         """Test SolarAPI with different initialization configurations."""
@@ -853,214 +841,121 @@ class TestTelegramBotComprehensiveCoverage:
                     assert result['answer'] == 'Search'
 
 
-class TestSolarAPIAdvancedCoverage:
-    """Advanced tests to cover remaining solar.py functionality."""
+@pytest.mark.xdist_group(name='solar_api_advanced')
+class TestSearchGroundedResponseSources:
+    """Tests for how _get_search_grounded_response maps Tavily results to sources."""
     
     @pytest.fixture
     def solar_api(self):
         """Create a SolarAPI instance for testing."""
         return SolarAPI('test-key')
     
-    def test_get_search_grounded_response_with_content_fallback(self, solar_api):
-        """Test _get_search_grounded_response with different content fields."""
-        mock_search_results = {
-            'results': [
-                {
-                    'title': 'Test Result',
-                    'url': 'https://example.com/1',
-                    'raw_content': 'Raw content when content field missing',  # This tests the fallback
-                    'score': 0.9
-                }
-            ]
-        }
-        
+    @pytest.fixture(autouse=True)
+    def tavily_key(self):
+        """Enable the real search path for every test in this class."""
         with patch.dict(os.environ, {'TAVILY_API_KEY': 'test-key'}):
-            with patch.object(solar_api, '_tavily_search', return_value=mock_search_results):
-                with patch.object(solar_api, 'complete', return_value='Response with raw content'):
-                    
-                    result = solar_api._get_search_grounded_response(
-                        "test query", ["query1"], "model", False, None, None
-                    )
-                    
-                    assert 'response' in result
-                    assert 'sources' in result
-                    assert result['sources'][0]['content'] == 'Raw content when content field missing'
+            yield
+    
+    def _grounded_response(self, solar_api, search_results):
+        """Run _get_search_grounded_response against canned Tavily results."""
+        with patch.object(solar_api, '_tavily_search', return_value=search_results):
+            with patch.object(solar_api, 'complete', return_value='Grounded response'):
+                return solar_api._get_search_grounded_response(
+                    "test query", ["query1"], "model", False, None, None
+                )
     
-    def test_get_search_grounded_response_no_content_fields(self, solar_api):
-        """Test _get_search_grounded_response with missing content fields."""
-        mock_search_results = {
-            'results': [
-                {
-                    'title': 'Test Result',
-                    'url': 'https://example.com/1',
-                    # No content or raw_content field
-                    'score': 0.9
-                }
-            ]
-        }
-        
-        with patch.dict(os.environ, {'TAVILY_API_KEY': 'test-key'}):
-            with patch.object(solar_api, '_tavily_search', return_value=mock_search_results):
-                with patch.object(solar_api, 'complete', return_value='Response with no content'):
-                    
-                    result = solar_api._get_search_grounded_response(
-                        "test query", ["query1"], "model", False, None, None
-                    )
-                    
-                    assert 'response' in result
-                    assert 'sources' in result
-                    assert result['sources'][0]['content'] == 'No Content'
-    
-    def test_get_search_grounded_response_missing_fields(self, solar_api):
-        """Test _get_search_grounded_response with missing title/url fields."""
-        mock_search_results = {
-            'results': [
-                {
-                    'title': 'Test Result',  # Add title
-                    'url': 'https://example.com/1',  # Add url
-                    'content': 'Some content',
-                    'score': 0.9
-                }
-            ]
-        }
-        
-        with patch.dict(os.environ, {'TAVILY_API_KEY': 'test-key'}):
-            with patch.object(solar_api, '_tavily_search', return_value=mock_search_results):
-                with patch.object(solar_api, 'complete', return_value='Response with missing fields'):
-                    
-                    result = solar_api._get_search_grounded_response(
-                        "test query", ["query1"], "model", False, None, None
-                    )
-                    
-                    assert 'response' in result
-                    assert 'sources' in result
-                    assert result['sources'][0]['title'] == 'Test Result'
-                    assert result['sources'][0]['url'] == 'https://example.com/1'
-    
-    def test_get_search_grounded_response_missing_published_date(self, solar_api):
-        """Test _get_search_grounded_response with missing published_date."""
-        mock_search_results = {
-            'results': [
-                {
-                    'title': 'Test Result',
-                    'url': 'https://example.com/1',
-                    'content': 'Test content',
-                    'score': 0.9
-                    # Missing published_date
-                }
-            ]
-        }
-        
-        with patch.dict(os.environ, {'TAVILY_API_KEY': 'test-key'}):
-            with patch.object(solar_api, '_tavily_search', return_value=mock_search_results):
-                with patch.object(solar_api, 'complete', return_value='Response with no date'):
-                    
-                    result = solar_api._get_search_grounded_response(
-                        "test query", ["query1"], "model", False, None, None
-                    )
-                    
-                    assert 'response' in result
-                    assert 'sources' in result
-                    assert result['sources'][0]['published_date'] == 'No Date'
+    @pytest.mark.parametrize('result, field, expected', [
+        # raw_content is used when the content field is missing
+        (_result(drop=('content',), raw_content='Raw content when content field missing'),
+         'content', 'Raw content when content field missing'),
+        # No content or raw_content field
+        (_result(drop=('content',)), 'content', 'No Content'),
+        (_result(), 'title', 'Test Result'),
+        (_result(), 'url', 'https://example.com/1'),
+        # Missing published_date
+        (_result(), 'published_date', 'No Date'),
+    ], ids=['content_fallback', 'no_content_fields', 'title', 'url', 'missing_published_date'])
+    def test_get_search_grounded_response_source_fields(self, solar_api, result, field, expected):
+        """Test that each source field is mapped or defaulted correctly."""
+        response = self._grounded_response(solar_api, {'results': [result]})
+        
+        assert response['response'] == 'Grounded response'
+        assert response['sources'][0][field] == expected
     
     def test_get_search_grounded_response_over_15_results(self, solar_api):
         """Test _get_search_grounded_response with more than 15 results (limit testing)."""
-        mock_search_results = {
-            'results': [
-                {
-                    'title': f'Test Result {i}',
-                    'url': f'https://example.com/{i}',
-                    'content': f'Test content {i}',
-                    'score': 0.9 - (i * 0.01)
-                } for i in range(20)  # 20 results, should be limited to 15
-            ]
-        }
+        response = self._grounded_response(solar_api, _MANY_RESULTS)
         
-        with patch.dict(os.environ, {'TAVILY_API_KEY': 'test-key'}):
-            with patch.object(solar_api, '_tavily_search', return_value=mock_search_results):
-                with patch.object(solar_api, 'complete', return_value='Response with many results'):
-                    
-                    result = solar_api._get_search_grounded_response(
-                        "test query", ["query1"], "model", False, None, None
-                    )
-                    
-                    assert 'response' in result
-                    assert 'sources' in result
-                    assert len(result['sources']) == 15  # Should be limited to 15
+        assert 'response' in response
+        assert len(response['sources']) == 15  # Should be limited to 15
+
+
+@pytest.mark.xdist_group(name='solar_api_advanced')
+class TestSolarAPIAdvancedCoverage:
+    """Advanced tests to cover remaining solar.py functionality."""
+    
+    @pytest.fixture
+    def solar_api(self):
+        """Create a SolarAPI instance for testing."""
+        return SolarAPI('test-key')
     
-    def test_complete_method_different_parameters(self, solar_api):
+    def test_complete_method_different_parameters(self, solar_api, http):
         """Test complete method with different parameter combinations."""
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+        http.post(SOLAR_URL, json={
             'choices': [{'message': {'content': 'Test response'}}]
-        }
+        })
         
         # Test with model parameter
-        with patch('requests.post', return_value=mock_response):
-            result = solar_api.complete("test", model="custom-model")
-            assert result == 'Test response'
+        result = solar_api.complete("test", model="custom-model")
+        assert result == 'Test response'
+        assert http.last_request.json()['model'] == 'custom-model'
         
         # Test with search_done_callback
-        callback_called = False
-        def callback(sources):
-            nonlocal callback_called
-            callback_called = True
+        callback = _Sink()
         
         with patch.dict(os.environ, {'TAVILY_API_KEY': 'test-key'}):
             with patch.object(solar_api, '_tavily_search', return_value={'results': []}):
-                with patch('requests.post', return_value=mock_response):
-                    result = solar_api.complete(
-                        "test", 
-                        search_grounding=True,
-                        search_done_callback=callback
-                    )
-                    assert callback_called
+                result = solar_api.complete(
+                    "test", 
+                    search_grounding=True,
+                    search_done_callback=callback
+                )
+                assert callback.called
+                assert callback.payload == []
     
-    def test_stream_request_error_handling(self, solar_api):
+    def test_stream_request_error_handling(self, solar_api, http):
         """Test _stream_request error handling."""
-        mock_response = Mock()
-        mock_response.status_code = 400
-        mock_response.text = "Bad Request"
+        http.post(SOLAR_URL, status_code=400, text="Bad Request")
         
-        with patch('requests.post', return_value=mock_response):
-            with pytest.raises(Exception, match="API request failed with status code 400"):
-                solar_api._stream_request({'test': 'payload'}, lambda x: None)
+        with pytest.raises(Exception, match="API request failed with status code 400"):
+            solar_api._stream_request({'test': 'payload'}, lambda x: None)
     
-    def test_stream_request_sse_parsing(self, solar_api):
+    def test_stream_request_sse_parsing(self, solar_api, http):
         """Test _stream_request SSE parsing edge cases."""
         # Test with malformed JSON in SSE
-        mock_events = [
-            Mock(data='data: invalid json'),
-            Mock(data='data: {"choices": [{"delta": {}}]}'),  # No content field
-            Mock(data='data: [DONE]')
+        events = [
+            _SSEEvent('invalid json'),
+            _SSEEvent('{"choices": [{"delta": {}}]}'),  # No content field
+            _SSEEvent('{"choices": []}'),  # No choices
+            _SSEEvent('[DONE]')
         ]
         
         updates_received = []
         def mock_update(content):
             updates_received.append(content)
         
-        mock_response = Mock()
-        mock_response.status_code = 200
-        
-        # Mock SSEClient as a class with events() method
-        mock_client = Mock()
-        mock_client.events.return_value = mock_events
+        http.post(SOLAR_URL)
         
-        with patch('sseclient.SSEClient', return_value=mock_client):
-            with patch('requests.post', return_value=mock_response):
-                result = solar_api._stream_request({'test': 'payload'}, mock_update)
-                
-                # Should handle malformed JSON gracefully
-                assert result == ''  # No valid content extracted
-                assert len(updates_received) == 0
+        with patch('sseclient.SSEClient', return_value=_fake_sse(events)):
+            result = solar_api._stream_request({'test': 'payload'}, mock_update)
+            
+            # Should handle malformed JSON gracefully
+            assert result == ''  # No valid content extracted
+            assert len(updates_received) == 0
     
-    def test_tavily_search_error_handling(self, solar_api):
+    def test_tavily_search_error_handling(self, solar_api, http):
         """Test _tavily_search error handling."""
-        mock_response = Mock()
-        mock_response.status_code = 500
-        mock_response.text = "Server Error"
+        http.post(TAVILY_URL, status_code=500, text="Server Error")
         
-        with patch('requests.post', return_value=mock_response):
-            result = solar_api._tavily_search("test query", "test-key")
-            assert result == {'results': []}  # Should return empty results on error 
\ No newline at end of file
+        result = solar_api._tavily_search("test query", "test-key")
+        assert result == {'results': []}  # Should return empty results on error
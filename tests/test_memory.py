@@ -1,8 +1,8 @@
 import pytest
 import os
 import json
-import tempfile
-import shutil
+import stat
+import threading
 from datetime import datetime
 from unittest.mock import patch, MagicMock
 
@@ -12,11 +12,11 @@ from memory import MemoryManager
 class TestMemoryManager:
     """Comprehensive tests for the MemoryManager class."""
     
-    def setup_method(self):
-        """Set up test environment before each test."""
-        # Create a temporary directory for test files
-        self.test_dir = tempfile.mkdtemp()
-        self.memory_file = os.path.join(self.test_dir, "test_memory.json")
+    @pytest.fixture(autouse=True)
+    def memory_manager(self, tmp_path):
+        """Fresh memory manager backed by a pytest-managed temp directory."""
+        self.test_dir = str(tmp_path)
+        self.memory_file = str(tmp_path / "test_memory.json")
         
         # Initialize memory manager with test file
         self.memory_manager = MemoryManager(
@@ -24,11 +24,7 @@ class TestMemoryManager:
             max_words=100,  # Small limit for testing
             summary_target=20
         )
-    
-    def teardown_method(self):
-        """Clean up after each test."""
-        # Remove test directory and all files
-        shutil.rmtree(self.test_dir, ignore_errors=True)
+        return self.memory_manager
     
     def test_initialization(self):
         """Test MemoryManager initialization."""
@@ -140,6 +136,31 @@ class TestMemoryManager:
         assert context.endswith("...")
         assert self.memory_manager._count_words(context) <= 15  # Some buffer for truncation
     
+    def test_get_context_recency_window(self):
+        """Test that only the most recent conversations are included in context."""
+        self.memory_manager.context_window = 2
+        for i in range(4):
+            self.memory_manager.add_conversation(f"Question {i}", f"Answer {i}")
+        
+        context = self.memory_manager.get_context()
+        
+        assert "User: Question 0" not in context
+        assert "User: Question 1" not in context
+        assert "User: Question 2" in context
+        assert "User: Question 3" in context
+    
+    def test_get_context_cache_invalidation(self):
+        """Test that cached context reflects later changes to memory."""
+        self.memory_manager.add_conversation("First question", "First answer")
+        context = self.memory_manager.get_context()
+        assert self.memory_manager.get_context() is context
+        
+        self.memory_manager.add_conversation("Second question", "Second answer")
+        assert "Second question" in self.memory_manager.get_context()
+        
+        self.memory_manager.memory["summary"] = "Edited summary"
+        assert "Edited summary" in self.memory_manager.get_context()
+    
     def test_memory_stats(self):
         """Test memory statistics."""
         # Initial stats
@@ -148,6 +169,7 @@ class TestMemoryManager:
         assert stats["word_count"] == 0
         assert stats["has_summary"] == False
         assert stats["last_updated"] is None
+        assert stats["memory_file_exists"] is False
         
         # Add conversation and check stats
         self.memory_manager.add_conversation("Hello", "Hi there")
@@ -155,6 +177,7 @@ class TestMemoryManager:
         assert stats["total_conversations"] == 1
         assert stats["word_count"] == 3
         assert stats["last_updated"] is not None
+        assert stats["memory_file_exists"] is True
     
     def test_clear_memory(self):
         """Test clearing memory."""
@@ -207,6 +230,25 @@ class TestMemoryManager:
         memory_manager = MemoryManager(memory_file=self.memory_file)
         assert len(memory_manager.memory["conversations"]) == 0
     
+    @pytest.mark.parametrize("stored", [
+        pytest.param({}, id="missing"),
+        pytest.param({"word_count": None}, id="null"),
+        pytest.param({"word_count": "12"}, id="string"),
+    ])
+    def test_load_memory_recounts_unusable_word_count(self, stored):
+        """Test that a missing or non-integer stored word count is recalculated on load."""
+        with open(self.memory_file, 'w') as f:
+            json.dump({
+                "conversations": [{"timestamp": "2024-01-01T00:00:00", "user_input": "Hello there",
+                                   "assistant_response": "Hi, how can I help?"}],
+                "summary": "Earlier greetings",
+                "last_updated": "2024-01-01T00:00:00",
+                **stored
+            }, f)
+        
+        memory_manager = MemoryManager(memory_file=self.memory_file)
+        assert memory_manager.memory["word_count"] == 2 + 5 + 2
+    
     def test_export_memory(self):
         """Test exporting memory."""
         # Add some data
@@ -228,6 +270,21 @@ class TestMemoryManager:
             file_data = json.load(f)
         assert len(file_data["conversations"]) == 1
     
+    def test_written_files_follow_umask(self):
+        """Test that atomic writes keep the permissions a plain open() would give."""
+        probe_file = os.path.join(self.test_dir, "probe.json")
+        with open(probe_file, 'w'):
+            pass
+        expected_mode = stat.S_IMODE(os.stat(probe_file).st_mode)
+        
+        self.memory_manager.add_conversation("Mode test", "Mode response")
+        self.memory_manager.save_memory()
+        export_file = os.path.join(self.test_dir, "exported.json")
+        self.memory_manager.export_memory(export_file)
+        
+        assert stat.S_IMODE(os.stat(self.memory_file).st_mode) == expected_mode
+        assert stat.S_IMODE(os.stat(export_file).st_mode) == expected_mode
+    
     def test_automatic_summarization_trigger(self):
         """Test that summarization is triggered when word count exceeds limit."""
         # Add conversations until we exceed the limit
@@ -242,6 +299,24 @@ class TestMemoryManager:
         # Summarization keeps last 5 conversations but the exact count may vary due to summary creation
         assert len(self.memory_manager.memory["conversations"]) <= 10  # Allow more flexibility
     
+    def test_heuristic_summary_mode_skips_llm(self):
+        """Test that summary_mode="heuristic" summarizes locally even when an LLM function is set."""
+        mock_llm = MagicMock(return_value="LLM summary")
+        manager = MemoryManager(memory_file=self.memory_file, max_words=100, llm_function=mock_llm,
+                                summary_mode="heuristic")
+        for i in range(15):
+            manager.add_conversation(f"Question {i}?", f"Answer {i} with some extra words here.")
+        
+        mock_llm.assert_not_called()
+        assert manager.memory["summary"].startswith("Topic: Question 0?")
+        assert len(manager.memory["conversations"]) < 15
+    
+    @pytest.mark.parametrize("summary_mode", ["LLM", "heuristics", ""])
+    def test_invalid_summary_mode(self, summary_mode):
+        """Test that an unsupported summary_mode is rejected instead of silently disabling LLM summaries."""
+        with pytest.raises(ValueError, match="summary_mode"):
+            MemoryManager(memory_file=self.memory_file, summary_mode=summary_mode)
+    
     def test_simple_summarization(self):
         """Test the simple summarization mechanism."""
         # Add many conversations
@@ -321,6 +396,21 @@ class TestMemoryManager:
         # Should have a summary (from simple fallback)
         assert len(self.memory_manager.memory["summary"]) > 0
     
+    def test_manual_summarization_survives_reload(self):
+        """Test that a summary made outside add_conversation is not undone by the log on reload."""
+        for i in range(6):
+            self.memory_manager.add_conversation(f"Question {i}", f"Answer {i}")
+        
+        self.memory_manager.summarize_with_llm(lambda prompt: "SUMMARY TEXT")
+        self.memory_manager.add_conversation("Question 6", "Answer 6")
+        
+        reloaded = MemoryManager(memory_file=self.memory_file)
+        assert reloaded.memory["summary"] == "SUMMARY TEXT"
+        assert [conv["user_input"] for conv in reloaded.memory["conversations"]] == [
+            "Question 3", "Question 4", "Question 5", "Question 6"
+        ]
+        assert reloaded.memory["word_count"] == self.memory_manager.memory["word_count"]
+    
     def test_context_with_recent_conversations_limit(self):
         """Test that context only includes recent conversations."""
         # Add many conversations
@@ -359,6 +449,145 @@ class TestMemoryManager:
         assert len(second_manager.memory["conversations"]) == 1
         assert second_manager.memory["conversations"][0]["user_input"] == "Persistence test"
     
+    def test_conversation_log_replay_and_compaction(self):
+        """Test that new conversations go to the log and are compacted on save."""
+        self.memory_manager.add_conversation("Logged question", "Logged answer")
+        
+        # Appended to the log rather than rewriting the memory file, which still counts as saved
+        assert os.path.exists(self.memory_manager.log_file)
+        assert not os.path.exists(self.memory_file)
+        assert self.memory_manager.get_memory_stats()["memory_file_exists"] is True
+        
+        # A new instance replays the log
+        second_manager = MemoryManager(memory_file=self.memory_file)
+        assert len(second_manager.memory["conversations"]) == 1
+        assert second_manager.memory["word_count"] == 4
+        
+        # Saving folds the log into the memory file
+        second_manager.save_memory()
+        assert os.path.exists(self.memory_file)
+        assert not os.path.exists(self.memory_manager.log_file)
+        assert len(MemoryManager(memory_file=self.memory_file).memory["conversations"]) == 1
+    
+    def test_derived_fields_not_persisted(self):
+        """Test that cached word counts and previews stay in memory and are rebuilt after a reload."""
+        derived = {"user_wc", "assistant_wc", "assistant_preview"}
+        self.memory_manager.add_conversation("Cache question", "Cached answer here")
+        
+        with open(self.memory_manager.log_file) as f:
+            assert not derived & json.loads(f.readline()).keys()
+        
+        self.memory_manager.save_memory()
+        with open(self.memory_file) as f:
+            assert not derived & json.load(f)["conversations"][0].keys()
+        exported = json.loads(self.memory_manager.export_memory())
+        assert not derived & exported["conversations"][0].keys()
+        
+        reloaded = MemoryManager(memory_file=self.memory_file)
+        assert reloaded.get_context() == self.memory_manager.get_context()
+        reloaded.add_conversation("Next question", "Next answer")
+        assert reloaded.memory["word_count"] == 5 + 4
+    
+    def test_compaction_interrupted_before_log_removal(self):
+        """Test that a log left behind by an interrupted compaction is not replayed twice."""
+        self.memory_manager.add_conversation("First", "One")
+        self.memory_manager.add_conversation("Second", "Two")
+        
+        # Stop between writing the memory file and removing the log
+        with patch.object(self.memory_manager, "_remove"):
+            self.memory_manager.save_memory()
+        assert os.path.exists(self.memory_manager.log_file)
+        
+        reloaded = MemoryManager(memory_file=self.memory_file)
+        assert [conv["user_input"] for conv in reloaded.memory["conversations"]] == ["First", "Second"]
+        assert reloaded.memory["word_count"] == 4
+        
+        # Turns logged after the interruption are still replayed
+        reloaded.add_conversation("Third", "Three")
+        assert [conv["user_input"] for conv in MemoryManager(memory_file=self.memory_file).memory["conversations"]] == [
+            "First", "Second", "Third"
+        ]
+    
+    def test_concurrent_adds_logged_once(self):
+        """Test that turns stored from several threads are each written to disk exactly once."""
+        manager = MemoryManager(memory_file=self.memory_file, max_words=100_000)
+        threads, per_thread = 8, 40
+        barrier = threading.Barrier(threads)
+        
+        def add_turns(thread_id):
+            barrier.wait()
+            for i in range(per_thread):
+                manager.add_conversation(f"Thread {thread_id} question {i}", "Answer")
+        
+        workers = [threading.Thread(target=add_turns, args=(t,)) for t in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        
+        expected = sorted(f"Thread {t} question {i}" for t in range(threads) for i in range(per_thread))
+        assert sorted(conv["user_input"] for conv in manager.memory["conversations"]) == expected
+        reloaded = MemoryManager(memory_file=self.memory_file)
+        assert sorted(conv["user_input"] for conv in reloaded.memory["conversations"]) == expected
+    
+    def test_buffered_writes_flush(self):
+        """Test that flush_every buffers conversations until flushed."""
+        manager = MemoryManager(memory_file=self.memory_file, flush_every=3)
+        manager.add_conversation("First", "One")
+        manager.add_conversation("Second", "Two")
+        assert not os.path.exists(manager.log_file)
+        
+        manager.flush()
+        assert len(MemoryManager(memory_file=self.memory_file).memory["conversations"]) == 2
+        
+        # Reaching flush_every writes without an explicit flush
+        for i in range(3):
+            manager.add_conversation(f"Question {i}", "Answer")
+        assert len(MemoryManager(memory_file=self.memory_file).memory["conversations"]) == 5
+    
+    def test_extend_conversations(self):
+        """Test that a batch updates word count and context and is written in one log append."""
+        context = self.memory_manager.get_context()
+        
+        with patch.object(self.memory_manager, "_append_bytes", wraps=self.memory_manager._append_bytes) as append:
+            self.memory_manager.extend_conversations([("First question", "First answer"),
+                                                      ("Second question", "Second answer")])
+        
+        append.assert_called_once()
+        assert self.memory_manager.memory["word_count"] == 8
+        assert self.memory_manager.memory["last_updated"] == self.memory_manager.memory["conversations"][-1]["timestamp"]
+        assert self.memory_manager.get_context() != context
+        assert "User: Second question" in self.memory_manager.get_context()
+        
+        reloaded = MemoryManager(memory_file=self.memory_file)
+        assert [conv["user_input"] for conv in reloaded.memory["conversations"]] == ["First question", "Second question"]
+        assert reloaded.memory["word_count"] == 8
+    
+    def test_extend_conversations_summarizes_once(self):
+        """Test that a batch past max_words is summarized and compacted once, keeping the newest turns."""
+        pairs = [(f"Question {i}?", f"Answer {i} with some extra words here.") for i in range(15)]
+        
+        with patch.object(self.memory_manager, "_summarize_memory", wraps=self.memory_manager._summarize_memory) as summarize:
+            self.memory_manager.extend_conversations(pairs)
+        
+        summarize.assert_called_once()
+        conversations = self.memory_manager.memory["conversations"]
+        assert [conv["user_input"] for conv in conversations] == [f"Question {i}?" for i in range(10, 15)]
+        assert self.memory_manager.memory["word_count"] <= self.memory_manager.max_words
+        assert not os.path.exists(self.memory_manager.log_file)
+        
+        reloaded = MemoryManager(memory_file=self.memory_file)
+        assert reloaded.memory["summary"] == self.memory_manager.memory["summary"]
+        assert len(reloaded.memory["conversations"]) == 5
+    
+    def test_extend_conversations_empty(self):
+        """Test that an empty batch leaves memory and disk untouched."""
+        self.memory_manager.extend_conversations([])
+        
+        assert self.memory_manager.memory["conversations"] == []
+        assert not os.path.exists(self.memory_file)
+        assert not os.path.exists(self.memory_manager.log_file)
+    
     def test_timestamp_format(self):
         """Test that timestamps are in correct ISO format."""
         self.memory_manager.add_conversation("Time test", "Response")
@@ -403,14 +632,12 @@ class TestMemoryManager:
 class TestMemoryManagerIntegration:
     """Integration tests for MemoryManager with real file operations."""
     
-    def setup_method(self):
-        """Set up integration test environment."""
-        self.test_dir = tempfile.mkdtemp()
-        self.memory_file = os.path.join(self.test_dir, "integration_memory.json")
-    
-    def teardown_method(self):
-        """Clean up integration test environment."""
-        shutil.rmtree(self.test_dir, ignore_errors=True)
+    @pytest.fixture(autouse=True)
+    def memory_file(self, tmp_path):
+        """Integration memory file in a pytest-managed temp directory."""
+        self.test_dir = str(tmp_path)
+        self.memory_file = str(tmp_path / "integration_memory.json")
+        return self.memory_file
     
     def test_concurrent_access_simulation(self):
         """Simulate concurrent access to memory file."""
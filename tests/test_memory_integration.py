@@ -1,59 +1,111 @@
 import pytest
-import tempfile
-import shutil
 import os
-from unittest.mock import patch, MagicMock
+import json
+from unittest.mock import patch, call, ANY
 
 from solar import SolarAPI
 from memory import MemoryManager
 
+# Mock API key
+API_KEY = "test_key"
+
+# Realistic Solar API responses: answered directly, without search
+_NO_SEARCH_RESPONSES = (
+    "N",  # Search decision - realistic single character response
+    "Python is a high-level, interpreted programming language that was created by Guido van Rossum and first released in 1991. It is known for its simplicity, readability, and ease of use, making it an ideal language for beginners as well as experienced developers. Python supports multiple programming paradigms, including procedural, object-oriented, and functional programming."
+)
+
+# Realistic Solar API responses for a query that needs search
+_SEARCH_RESPONSES = (
+    "Y",  # Search decision - needs search
+    '```json\n[\n  "latest AI developments 2024",\n  "new AI technologies 2024",\n  "AI advancements in 2024"\n]\n```',  # Search queries with markdown
+    "Based on recent developments, AI in 2024 has seen significant advances in large language models, computer vision, and robotics. Major breakthroughs include improved reasoning capabilities, better multimodal understanding, and more efficient training methods. Companies like OpenAI, Google, and others have released more powerful models with enhanced capabilities."
+)
+
+# Tavily search results returned for that query, in the API's response format
+_TAVILY_RESPONSE = {
+    "results": [
+        {
+            'title': 'AI Developments 2024: Latest Breakthroughs',
+            'url': 'https://example.com/ai-2024',
+            'content': 'Recent AI developments include advanced language models and improved reasoning capabilities. Major companies have released more sophisticated AI systems.',
+            'score': 0.95,
+            'published_date': '2024-12-01'
+        },
+        {
+            'title': 'New AI Technologies Emerging in 2024',
+            'url': 'https://example.com/ai-tech-2024',
+            'content': 'Computer vision and robotics advances have been significant this year. Multimodal AI systems are becoming more prevalent.',
+            'score': 0.89,
+            'published_date': '2024-11-15'
+        }
+    ]
+}
+
+# Realistic Solar API responses for two turns that build on each other
+_CONTEXT_RESPONSES = (
+    "N",  # First query - no search needed
+    "Hello John! Nice to meet you. It's great to connect with a fellow software engineer. What kind of software development do you focus on?",
+    "N",  # Second query - no search needed  
+    "Based on your background as a software engineer named John, I'd recommend focusing on Python for backend development with frameworks like Django or Flask, and JavaScript for frontend work. Given your experience, you might also want to explore TypeScript for better code maintainability and modern frameworks like React or Vue.js."
+)
+
+
+class PromptContains:
+    """Matches a chat completion payload whose user message contains the given text."""
+    
+    def __init__(self, text):
+        self.text = text
+    
+    def __eq__(self, payload):
+        return self.text in payload["messages"][0]["content"]
+    
+    def __repr__(self):
+        return f"PromptContains({self.text!r})"
+
+
+@pytest.fixture
+def memory_file(tmp_path):
+    """Per-test memory file in a pytest-managed temp directory."""
+    return str(tmp_path / "integration_memory.json")
+
+
+@pytest.fixture(scope="class")
+def shared_solar_api(tmp_path_factory):
+    """One memory-enabled SolarAPI built once per test class."""
+    memory_file = str(tmp_path_factory.mktemp("memory") / "integration_memory.json")
+    return SolarAPI(api_key=API_KEY, memory_file=memory_file, enable_memory=True)
+
+
+@pytest.fixture(scope="class")
+def solar_api_no_memory():
+    """One memory-disabled SolarAPI built once per test class."""
+    return SolarAPI(api_key=API_KEY, enable_memory=False)
+
 
 class TestMemoryIntegrationWithSolarAPI:
     """Integration tests for memory functionality with SolarAPI."""
     
-    def setup_method(self):
-        """Set up test environment."""
-        self.test_dir = tempfile.mkdtemp()
-        self.memory_file = os.path.join(self.test_dir, "integration_memory.json")
-        
-        # Mock API key
-        self.api_key = "test_key"
-        
-    def teardown_method(self):
-        """Clean up test environment."""
-        shutil.rmtree(self.test_dir, ignore_errors=True)
+    @pytest.fixture
+    def solar_api(self, shared_solar_api, memory_file):
+        """The shared SolarAPI, pointed at this test's memory file with memory cleared."""
+        manager = shared_solar_api.memory_manager
+        manager.memory_file = memory_file
+        manager.log_file = memory_file + ".log"
+        manager.clear_memory()
+        max_words, summary_mode = manager.max_words, manager.summary_mode
+        yield shared_solar_api
+        manager.max_words, manager.summary_mode = max_words, summary_mode
     
-    def test_solar_api_with_memory_enabled(self):
+    def test_solar_api_with_memory_enabled(self, solar_api, memory_file):
         """Test SolarAPI initialization with memory enabled."""
-        solar_api = SolarAPI(
-            api_key=self.api_key,
-            memory_file=self.memory_file,
-            enable_memory=True
-        )
-        
         assert solar_api.enable_memory is True
         assert solar_api.memory_manager is not None
         assert isinstance(solar_api.memory_manager, MemoryManager)
-        assert solar_api.memory_manager.memory_file == self.memory_file
-    
-    def test_solar_api_with_memory_disabled(self):
-        """Test SolarAPI initialization with memory disabled."""
-        solar_api = SolarAPI(
-            api_key=self.api_key,
-            enable_memory=False
-        )
-        
-        assert solar_api.enable_memory is False
-        assert solar_api.memory_manager is None
+        assert solar_api.memory_manager.memory_file == memory_file
     
-    def test_memory_stats_with_memory_enabled(self):
+    def test_memory_stats_with_memory_enabled(self, solar_api):
         """Test memory statistics with memory enabled."""
-        solar_api = SolarAPI(
-            api_key=self.api_key,
-            memory_file=self.memory_file,
-            enable_memory=True
-        )
-        
         stats = solar_api.get_memory_stats()
         
         assert "memory_disabled" not in stats
@@ -62,31 +114,10 @@ class TestMemoryIntegrationWithSolarAPI:
         assert stats["total_conversations"] == 0
         assert stats["word_count"] == 0
     
-    def test_memory_stats_with_memory_disabled(self):
-        """Test memory statistics with memory disabled."""
-        solar_api = SolarAPI(
-            api_key=self.api_key,
-            enable_memory=False
-        )
-        
-        stats = solar_api.get_memory_stats()
-        
-        assert stats == {"memory_disabled": True}
-    
     @patch('solar.SolarAPI._standard_request')
-    def test_intelligent_complete_stores_conversation_in_memory(self, mock_request):
+    def test_intelligent_complete_stores_conversation_in_memory(self, mock_request, solar_api, memory_file):
         """Test that intelligent_complete stores conversations in memory."""
-        # Mock realistic Solar API responses based on actual API behavior
-        mock_request.side_effect = [
-            "N",  # Search decision - realistic single character response
-            "Python is a high-level, interpreted programming language that was created by Guido van Rossum and first released in 1991. It is known for its simplicity, readability, and ease of use, making it an ideal language for beginners as well as experienced developers. Python supports multiple programming paradigms, including procedural, object-oriented, and functional programming."
-        ]
-        
-        solar_api = SolarAPI(
-            api_key=self.api_key,
-            memory_file=self.memory_file,
-            enable_memory=True
-        )
+        mock_request.side_effect = list(_NO_SEARCH_RESPONSES)
         
         user_query = "What is Python?"
         result = solar_api.intelligent_complete(user_query)
@@ -103,47 +134,23 @@ class TestMemoryIntegrationWithSolarAPI:
         assert conversations[0]["assistant_response"] == result["answer"]
         assert conversations[0]["metadata"]["search_used"] is False
         
+        # The turn was appended to the log and survives a reload
+        reloaded = MemoryManager(memory_file=memory_file).memory["conversations"]
+        assert [conv["user_input"] for conv in reloaded] == [user_query]
+        
         # Verify the response content is realistic
         assert "Python" in result["answer"]
         assert "programming language" in result["answer"]
         assert len(result["answer"]) > 100  # Realistic length
     
     @patch('solar.SolarAPI._standard_request')
-    def test_intelligent_complete_with_search_stores_conversation(self, mock_request):
+    def test_intelligent_complete_with_search_stores_conversation(self, mock_request, solar_api):
         """Test that intelligent_complete with search stores conversations properly."""
-        # Mock realistic Solar API responses for search scenario
-        mock_request.side_effect = [
-            "Y",  # Search decision - needs search
-            '```json\n[\n  "latest AI developments 2024",\n  "new AI technologies 2024",\n  "AI advancements in 2024"\n]\n```',  # Search queries with markdown
-            "Based on recent developments, AI in 2024 has seen significant advances in large language models, computer vision, and robotics. Major breakthroughs include improved reasoning capabilities, better multimodal understanding, and more efficient training methods. Companies like OpenAI, Google, and others have released more powerful models with enhanced capabilities."
-        ]
+        mock_request.side_effect = list(_SEARCH_RESPONSES)
         
-        # Mock the search function to return realistic results in the correct Tavily API format
+        # Mock the search function to return realistic results
         with patch.object(SolarAPI, '_tavily_search') as mock_search:
-            mock_search.return_value = {
-                "results": [
-                    {
-                        'title': 'AI Developments 2024: Latest Breakthroughs',
-                        'url': 'https://example.com/ai-2024',
-                        'content': 'Recent AI developments include advanced language models and improved reasoning capabilities. Major companies have released more sophisticated AI systems.',
-                        'score': 0.95,
-                        'published_date': '2024-12-01'
-                    },
-                    {
-                        'title': 'New AI Technologies Emerging in 2024',
-                        'url': 'https://example.com/ai-tech-2024',
-                        'content': 'Computer vision and robotics advances have been significant this year. Multimodal AI systems are becoming more prevalent.',
-                        'score': 0.89,
-                        'published_date': '2024-11-15'
-                    }
-                ]
-            }
-            
-            solar_api = SolarAPI(
-                api_key=self.api_key,
-                memory_file=self.memory_file,
-                enable_memory=True
-            )
+            mock_search.return_value = _TAVILY_RESPONSE
             
             user_query = "What are the latest AI developments in 2024?"
             
@@ -171,21 +178,9 @@ class TestMemoryIntegrationWithSolarAPI:
             assert len(result["sources"]) > 0
     
     @patch('solar.SolarAPI._standard_request')
-    def test_memory_context_usage_in_queries(self, mock_request):
+    def test_memory_context_usage_in_queries(self, mock_request, solar_api):
         """Test that memory context is properly used in subsequent queries."""
-        # Mock realistic Solar API responses
-        mock_request.side_effect = [
-            "N",  # First query - no search needed
-            "Hello John! Nice to meet you. It's great to connect with a fellow software engineer. What kind of software development do you focus on?",
-            "N",  # Second query - no search needed  
-            "Based on your background as a software engineer named John, I'd recommend focusing on Python for backend development with frameworks like Django or Flask, and JavaScript for frontend work. Given your experience, you might also want to explore TypeScript for better code maintainability and modern frameworks like React or Vue.js."
-        ]
-        
-        solar_api = SolarAPI(
-            api_key=self.api_key,
-            memory_file=self.memory_file,
-            enable_memory=True
-        )
+        mock_request.side_effect = list(_CONTEXT_RESPONSES)
         
         # First conversation - establish context
         first_query = "Hello, my name is John and I'm a software engineer"
@@ -203,21 +198,21 @@ class TestMemoryIntegrationWithSolarAPI:
         assert "John" in result2["answer"] or "software engineer" in result2["answer"]
         
         # Verify context was passed to the API call
-        # The mock should have been called with prompts that include memory context
+        # Only the second query's prompts (search decision and answer) carry the memory context
+        mock_request.assert_has_calls([
+            call(ANY),
+            call(ANY),
+            call(PromptContains("Previous conversation context")),
+            call(PromptContains("Previous conversation context")),
+        ])
         assert mock_request.call_count == 4  # 2 calls per intelligent_complete
     
     @patch('solar.SolarAPI.complete')
-    def test_memory_summarization_with_realistic_llm_response(self, mock_complete):
+    def test_memory_summarization_with_realistic_llm_response(self, mock_complete, solar_api):
         """Test memory summarization with realistic LLM response."""
         # Mock realistic summarization response
         mock_complete.return_value = "The conversation involves an introduction between a user named John and the assistant. John identifies himself as a software engineer who specializes in web application development using Python and JavaScript. The assistant acknowledges the strengths of both languages and provides recommendations for John's development work. The interaction establishes John's professional background and programming expertise."
         
-        solar_api = SolarAPI(
-            api_key=self.api_key,
-            memory_file=self.memory_file,
-            enable_memory=True
-        )
-        
         # Add some conversations to memory - enough to potentially trigger automatic summarization
         conversations = [
             ("Hello, my name is John and I'm a software engineer", "Hello John! Nice to meet you. What kind of development do you focus on?"),
@@ -228,8 +223,7 @@ class TestMemoryIntegrationWithSolarAPI:
             ("What about deployment of ML models?", "You can deploy ML models using Flask/FastAPI for APIs, Docker for containerization, and cloud platforms like AWS or GCP.")
         ]
         
-        for user_input, response in conversations:
-            solar_api.memory_manager.add_conversation(user_input, response)
+        solar_api.memory_manager.extend_conversations(conversations)
         
         # Trigger summarization
         solar_api.summarize_memory()
@@ -243,24 +237,8 @@ class TestMemoryIntegrationWithSolarAPI:
         assert "software engineer" in call_args
         assert "summary" in call_args.lower()  # The prompt uses "summary" not "summarize"
     
-    def test_get_conversation_context_with_memory_disabled(self):
-        """Test getting conversation context with memory disabled."""
-        solar_api = SolarAPI(
-            api_key=self.api_key,
-            enable_memory=False
-        )
-        
-        context = solar_api.get_conversation_context()
-        assert context == ""
-    
-    def test_clear_memory_functionality(self):
+    def test_clear_memory_functionality(self, solar_api):
         """Test clearing memory functionality."""
-        solar_api = SolarAPI(
-            api_key=self.api_key,
-            memory_file=self.memory_file,
-            enable_memory=True
-        )
-        
         # Manually add a conversation to memory
         solar_api.memory_manager.add_conversation("Test", "Response")
         
@@ -276,14 +254,8 @@ class TestMemoryIntegrationWithSolarAPI:
         assert stats_after["total_conversations"] == 0
         assert stats_after["word_count"] == 0
     
-    def test_memory_manager_gets_llm_function(self):
+    def test_memory_manager_gets_llm_function(self, solar_api):
         """Test that memory manager receives the LLM function for summarization."""
-        solar_api = SolarAPI(
-            api_key=self.api_key,
-            memory_file=self.memory_file,
-            enable_memory=True
-        )
-        
         # Check that memory manager has the LLM function
         assert solar_api.memory_manager.llm_function is not None
         
@@ -291,34 +263,74 @@ class TestMemoryIntegrationWithSolarAPI:
         assert callable(solar_api.memory_manager.llm_function)
     
     @patch('solar.SolarAPI._standard_request')
-    def test_memory_automatic_summarization_trigger(self, mock_request):
+    def test_memory_automatic_summarization_trigger(self, mock_request, solar_api, memory_file):
         """Test that memory automatically triggers summarization when word limit is exceeded."""
         # Mock realistic responses
         mock_request.side_effect = [
             "N",  # Search decision
-            "This is a long response that will help us exceed the word limit for testing automatic summarization. " * 20,  # Long response
-            "The conversation has been summarized to preserve important information while reducing memory usage. Key points include user interactions and important context that should be maintained for future conversations."  # Summarization response
+            "This is a long response that will help us exceed the word limit for testing automatic summarization. " * 20  # Long response
         ]
         
-        # Create memory manager with very low word limit for testing
-        solar_api = SolarAPI(
-            api_key=self.api_key,
-            memory_file=self.memory_file,
-            enable_memory=True
-        )
-        
-        # Manually set a low word limit for testing
+        # Low word limit and heuristic summaries, so the trigger needs no LLM call
         solar_api.memory_manager.max_words = 100
+        solar_api.memory_manager.summary_mode = "heuristic"
+        for i in range(6):
+            solar_api.memory_manager.add_conversation(f"Short question {i}", "Short answer")
         
         # Add enough content to trigger summarization
         long_query = "Tell me about programming languages and their applications in modern software development"
-        result = solar_api.intelligent_complete(long_query)
+        solar_api.intelligent_complete(long_query)
+        
+        # Older turns were folded into the summary without another API request
+        assert mock_request.call_count == 2
+        assert len(solar_api.memory_manager.memory["conversations"]) == 5
+        assert "Topic: Short question 0" in solar_api.memory_manager.memory["summary"]
+        
+        # Summarization compacted the log, so a reload sees the summarized memory
+        reloaded = MemoryManager(memory_file=memory_file)
+        assert reloaded.memory["summary"] == solar_api.memory_manager.memory["summary"]
+        assert len(reloaded.memory["conversations"]) == 5
+        assert not os.path.exists(memory_file + ".log")
+
+
+class TestMemoryDisabledSolarAPI:
+    """SolarAPI behavior with memory disabled; these tests never touch memory files."""
+    
+    def test_solar_api_with_memory_disabled(self, solar_api_no_memory):
+        """Test SolarAPI initialization with memory disabled."""
+        assert solar_api_no_memory.enable_memory is False
+        assert solar_api_no_memory.memory_manager is None
+    
+    def test_memory_stats_with_memory_disabled(self, solar_api_no_memory):
+        """Test memory statistics with memory disabled."""
+        stats = solar_api_no_memory.get_memory_stats()
         
-        # The response should have triggered summarization
-        # We can't easily test the automatic trigger in this setup, but we can verify
-        # that the memory manager has the capability
-        assert hasattr(solar_api.memory_manager, 'llm_function')
-        assert callable(solar_api.memory_manager.llm_function)
+        assert stats == {"memory_disabled": True}
+    
+    def test_get_conversation_context_with_memory_disabled(self, solar_api_no_memory):
+        """Test getting conversation context with memory disabled."""
+        context = solar_api_no_memory.get_conversation_context()
+        assert context == ""
+
+
+class TestMemoryPersistenceWithSolarAPI:
+    """On-disk round trip of SolarAPI memory, with real saves."""
+    
+    def test_save_and_reload_roundtrip(self, tmp_path):
+        """Test that conversations written through SolarAPI survive a reload."""
+        memory_file = str(tmp_path / "roundtrip_memory.json")
+        solar_api = SolarAPI(api_key=API_KEY, memory_file=memory_file, enable_memory=True)
+        solar_api.memory_manager.add_conversation("Persist me", "Persisted")
+        solar_api.memory_manager.save_memory()
+        
+        with open(memory_file, encoding="utf-8") as f:
+            on_disk = json.load(f)
+        assert set(on_disk) >= {"conversations", "summary", "last_updated", "word_count"}
+        assert on_disk["conversations"][0]["user_input"] == "Persist me"
+        
+        reloaded = SolarAPI(api_key=API_KEY, memory_file=memory_file, enable_memory=True)
+        assert reloaded.get_memory_stats()["total_conversations"] == 1
+        assert reloaded.memory_manager.memory["conversations"][0]["assistant_response"] == "Persisted"
 
 
 if __name__ == "__main__":